@@ -1,10 +1,30 @@
 #!/usr/bin/env python3
 
+import atexit
 import configparser
+import cProfile
+import functools
+import hmac
+import itertools
+import json
 import logging
 import os
+import pstats
+import queue
 import requests
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from tkinter import *
+from tkinter import filedialog, messagebox
+from urllib.parse import parse_qs, urlparse
+
+from board_plan import plan_add, resolve_roster, verify_board
+from cassette import Cassette
+from roster_search import Roster_Search
 
 
 ###############################################################################
@@ -13,9 +33,34 @@ fn = os.path.join(os.path.dirname(__file__), "config.txt")
 config = configparser.ConfigParser()
 config.read(fn)
 
-# Set json for key and token to be used with query params
-auth = {"key": config["auth"]["key"],
-        "token": config["auth"]["secret"]}
+# Each raid team has its own board. [trello] is the default team and every
+# [board:<team>] section adds one, overriding any [trello] setting it names.
+boards = {config["trello"].get("team", "Main"): dict(config["trello"])}
+for section in config.sections():
+    if section.startswith("board:"):
+        boards[section[len("board:"):]] = dict(config["trello"],
+                                               **config[section])
+active_team = next(iter(boards))
+board_config = boards[active_team]
+
+server_mode = config.get("server", "mode", fallback="off")
+server_token = config.get("server", "token", fallback="")
+# "change-me" was the placeholder in older copies of sample-config.txt
+if server_mode in ("host", "client") and server_token in ("", "change-me"):
+    print("Board server needs a [server] token, running on your own.")
+    server_mode = "off"
+
+# Set json for key and token to be used with query params. Requests run on
+# several threads, so never modify auth, build params from dict(auth).
+# Clients read the board from the host and replaying a cassette never talks
+# to Trello, so neither needs [auth].
+if (server_mode == "client" or
+        config.get("cassette", "mode", fallback="off") == "replay"):
+    auth = {"key": config.get("auth", "key", fallback=""),
+            "token": config.get("auth", "secret", fallback="")}
+else:
+    auth = {"key": config["auth"]["key"],
+            "token": config["auth"]["secret"]}
 
 # Define logging
 formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
@@ -30,10 +75,120 @@ ch.setFormatter(formatter)
 event_log.addHandler(fh)
 event_log.addHandler(ch)
 
+# Operation history read by analytics.py
+history_fn = "history.jsonl"
+
+
+def record_history(event, name=None, **fields):
+    entry = {"time": time.time(),
+             "event": event,
+             "team": current_data.team,
+             "name": name}
+    entry.update(fields)
+    with open(history_fn, "a") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+###############################################################################
+# Tracing
+# Records how long each button action, Trello request, board load and redraw
+# takes. Exports use the Chrome trace-event format, so they can be opened in
+# chrome://tracing or ui.perfetto.dev after a raid.
+class Tracer:
+    def __init__(self, limit=100000):
+        self.events = deque(maxlen=limit)
+        self.start = time.perf_counter()
+        self.profiler = None
+
+    # Yields the span's args so callers can attach results such as status
+    @contextmanager
+    def span(self, name, category, **args):
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            end = time.perf_counter()
+            self.events.append({"name": name,
+                                "cat": category,
+                                "ph": "X",
+                                "ts": (start - self.start) * 1e6,
+                                "dur": (end - start) * 1e6,
+                                "pid": os.getpid(),
+                                "tid": threading.get_ident(),
+                                "args": args})
+
+    def traced(self, category, name=None):
+        def wrap(func):
+            @functools.wraps(func)
+            def traced_func(*args, **kwargs):
+                with self.span(name or func.__name__, category):
+                    return func(*args, **kwargs)
+            return traced_func
+        return wrap
+
+    def export(self, path):
+        threads = [{"name": "thread_name",
+                    "ph": "M",
+                    "pid": os.getpid(),
+                    "tid": thread.ident,
+                    "args": {"name": thread.name}}
+                   for thread in threading.enumerate()]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": threads + list(self.events),
+                       "displayTimeUnit": "ms"}, f)
+        return len(self.events)
+
+    # Starts cProfile, or stops it and writes the stats to path
+    def toggle_profile(self, path):
+        if self.profiler is None:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+            return True
+        self.profiler.disable()
+        self.profiler.dump_stats(path)
+        pstats.Stats(self.profiler).sort_stats("cumulative").print_stats(20)
+        self.profiler = None
+        return False
+
+
+tracer = Tracer()
+
 
 ###############################################################################
 # Trello API Class
+# Trello allows 100 requests per 10 seconds per token, and every board shares
+# the token, so all requests draw from one bucket.
+class Rate_Limiter:
+    def __init__(self, limit, seconds):
+        self.capacity = limit
+        self.tokens = limit
+        self.rate = limit / seconds
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity,
+                                  self.tokens +
+                                  (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
 class Trello:
+    # Set to a Cassette to record or replay every request
+    cassette = None
+    # Pooled connections and rate limit shared by every board
+    session = requests.Session()
+    limiter = Rate_Limiter(int(config["trello"].get("rate_limit", "100")),
+                           float(config["trello"].get("rate_window", "10")))
+
     def __init__(self, method, request, params, payload):
         self.base_url = "https://api.trello.com"
         self.headers = {"Content-Type": "application/json",
@@ -46,45 +201,93 @@ class Trello:
     # Sends request and returns the response
     def get_response(self):
         url = f"{self.base_url}{self.request}"
-        resp = requests.request(self.method,
-                                url,
-                                headers=self.headers,
-                                params=self.params,
-                                json=self.payload)
+        replay = Trello.cassette and Trello.cassette.mode == "replay"
+        # Waiting on the shared budget is traced apart from network time
+        if not replay:
+            with tracer.span("acquire", "ratelimit"):
+                Trello.limiter.acquire()
+        with tracer.span(f"{self.method} {self.request}", "http") as span:
+            if replay:
+                resp = Trello.cassette.play(self)
+            else:
+                start = time.perf_counter()
+                resp = Trello.session.request(self.method,
+                                              url,
+                                              headers=self.headers,
+                                              params=self.params,
+                                              json=self.payload)
+                if Trello.cassette:
+                    Trello.cassette.record(self, resp,
+                                           time.perf_counter() - start)
+            span["status"] = resp.status_code
         if resp.status_code is not 200:
             print(f"API request failed with status: {resp.status_code}")
             return resp.content
-        return resp.json()
+        with tracer.span("json", "parse", size=len(resp.content)):
+            return resp.json()
+
+
+Trello.session.mount("https://",
+                     requests.adapters.HTTPAdapter(pool_connections=4,
+                                                   pool_maxsize=16))
+
+
+###############################################################################
+# Trello cassettes
+# Cassette is in cassette.py. Record mode saves the cassette when the app
+# exits.
+if config.get("cassette", "mode", fallback="off") in ("record", "replay"):
+    Trello.cassette = Cassette(config["cassette"]["path"],
+                               config["cassette"]["mode"],
+                               config.get("cassette", "latency",
+                                          fallback="0"))
+    if Trello.cassette.mode == "record":
+        atexit.register(Trello.cassette.save)
 
 
 ###############################################################################
 # Trello Data Parse Class
 class Trello_Data:
-    def __init__(self):
+    @tracer.traced("board", "Trello_Data")
+    def __init__(self, team=None):
+        # Clients read the board from the host instead of Trello
+        if board_client:
+            try:
+                self.__dict__.update(board_client.fetch())
+            except (requests.RequestException, ValueError) as e:
+                # Start empty, the watcher syncs once the host is up
+                print(f"Unable to reach host: {e}")
+                self.team = active_team
+                self.board = board_config
+                self.members = []
+            return
+        self.team = team or active_team
+        self.board = boards[self.team]
+        self.sequence = next(load_sequence)
         self.all_lists = Trello("GET",
-                                f"/1/boards/{config['trello']['board_id']}"
+                                f"/1/boards/{self.board['board_id']}"
                                 f"/lists",
-                                auth,
+                                dict(auth),
                                 None).get_response()
         self.all_cards = self.batch_get_cards()
         for list in self.all_lists:
             try:
-                if list["name"] == config["trello"]["main_master"]:
+                if list["name"] == self.board["main_master"]:
                     self.main_master_id = list["id"]
                     continue
-                elif list["name"] == config["trello"]["tier_master"]:
+                elif list["name"] == self.board["tier_master"]:
                     self.tier_master_id = list["id"]
                     continue
-                elif list["name"] == config["trello"]["main_pull"]:
+                elif list["name"] == self.board["main_pull"]:
                     self.main_pull_id = list["id"]
                     continue
-                elif list["name"] == config["trello"]["tier_pull"]:
+                elif list["name"] == self.board["tier_pull"]:
                     self.tier_pull_id = list["id"]
                     continue
-                elif list["name"] == config["trello"]["main_live"]:
+                elif list["name"] == self.board["main_live"]:
                     self.main_live_id = list["id"]
                     continue
-                elif list["name"] == config["trello"]["tier_live"]:
+                elif list["name"] == self.board["tier_live"]:
                     self.tier_live_id = list["id"]
             except IndexError:
                 continue
@@ -119,12 +322,17 @@ class Trello_Data:
                 print(e)
         self.members = sorted(self.main_master_cards,
                               key=lambda i: (i['name']))
+        # Loads can finish out of order, keep the one that started last
+        with cache_lock:
+            cached = board_cache.get(self.team)
+            if cached is None or cached.sequence < self.sequence:
+                board_cache[self.team] = self
 
     def batch_get_cards(self):
         batch_urls = []
         for list in self.all_lists:
             batch_urls.append(f"/lists/{list['id']}/cards")
-        batch_params = auth
+        batch_params = dict(auth)
         batch_params["urls"] = batch_urls
         try:
             batch_response = Trello("GET",
@@ -137,10 +345,218 @@ class Trello_Data:
         return batch_response
 
 
+###############################################################################
+# Shared board server
+# One officer hosts the board and owns the Trello connection. Other officers
+# run as clients: they read the board from the host's memory and send their
+# button actions to the host, which runs them one at a time.
+class Board_Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host, port, token):
+        super().__init__((host, int(port)), Board_Handler)
+        self.token = token.encode()
+        self.version = 0
+        self.log = []
+        self.body = None
+        self.changed = threading.Condition()
+
+    # Called after the board changes so waiting clients get pushed the update
+    def publish(self):
+        with self.changed:
+            self.version += 1
+            self.body = None
+            self.changed.notify_all()
+
+    def add_log(self, message):
+        with self.changed:
+            self.log.append(message)
+
+    # Serialize the board once per version and share it with every client
+    def board(self, log_index):
+        with self.changed:
+            if self.body is None:
+                self.body = json.dumps(vars(current_data))
+            return (f'{{"version": {self.version}, '
+                    f'"log": {json.dumps(self.log[log_index:])}, '
+                    f'"log_index": {len(self.log)}, '
+                    f'"data": {self.body}}}')
+
+    def wait(self, since, timeout=25):
+        with self.changed:
+            self.changed.wait_for(lambda: self.version != since, timeout)
+            return self.version
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        print(f"Serving board on {self.server_address[0]}:"
+              f"{self.server_address[1]}")
+
+
+class Board_Handler(BaseHTTPRequestHandler):
+    # Every request must carry the shared [server] token
+    def authorized(self):
+        token = self.headers.get("X-Board-Token", "").encode()
+        if hmac.compare_digest(token, self.server.token):
+            return True
+        self.send_error(403)
+        return False
+
+    def do_GET(self):
+        if not self.authorized():
+            return
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path == "/board":
+            body = self.server.board(int(query.get("log", ["0"])[0]))
+        elif url.path == "/wait":
+            version = self.server.wait(int(query.get("since", ["-1"])[0]))
+            body = json.dumps({"version": version})
+        else:
+            return self.send_error(404)
+        self.reply(body)
+
+    def do_POST(self):
+        if not self.authorized():
+            return
+        if self.path != "/op":
+            return self.send_error(404)
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length))
+        try:
+            op = SERVER_OPS[request["op"]]
+        except KeyError:
+            return self.send_error(400)
+        # Writes run on the host's UI thread, so they never overlap. The team
+        # is checked there too, the host may switch teams before it runs.
+        conflict = object()
+
+        def run(*args):
+            if request.get("team") != active_team:
+                return conflict
+            return op(*args)
+        reply = queue.Queue()
+        ui_queue.put((run, request.get("args", []), reply))
+        result = reply.get()
+        if result is conflict:
+            return self.send_error(409)
+        self.reply(json.dumps({"result": result}))
+
+    def reply(self, body):
+        body = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Board_Client:
+    def __init__(self, url, token):
+        self.url = url.rstrip("/")
+        self.session = requests.Session()
+        self.session.headers["X-Board-Token"] = token
+        self.version = -1
+        self.log_index = 0
+        self.unread = []
+
+    def fetch(self):
+        resp = self.session.get(f"{self.url}/board",
+                                params={"log": self.log_index},
+                                timeout=30)
+        resp.raise_for_status()
+        resp = resp.json()
+        self.version = resp["version"]
+        self.log_index = resp["log_index"]
+        self.unread.extend(resp["log"])
+        return resp["data"]
+
+    def read_log(self):
+        messages, self.unread = self.unread, []
+        return messages
+
+    # Sends the team the client is looking at, so the host refuses the op if
+    # it has switched to another team since
+    def run_op(self, op, *args):
+        try:
+            resp = self.session.post(f"{self.url}/op",
+                                     json={"op": op, "args": args,
+                                           "team": current_data.team},
+                                     timeout=600)
+        except requests.RequestException as e:
+            print(e)
+            return False
+        if resp.status_code == 409:
+            print("Host has switched teams, nothing was changed.")
+            return False
+        if resp.status_code != 200:
+            print(f"Host request failed with status: {resp.status_code}")
+            return False
+        return resp.json()["result"]
+
+    # Long-polls the host and queues a redraw whenever the board changes.
+    # The redraw is skipped if an action already fetched that version.
+    def watch(self):
+        seen = self.version
+        while True:
+            try:
+                resp = self.session.get(f"{self.url}/wait",
+                                        params={"since": seen},
+                                        timeout=60)
+                resp.raise_for_status()
+                version = resp.json()["version"]
+            except (requests.RequestException, ValueError) as e:
+                print(e)
+                threading.Event().wait(5)
+                continue
+            if version != seen:
+                seen = version
+                ui_queue.put((sync_board, [version], None))
+
+    def start(self):
+        threading.Thread(target=self.watch, daemon=True).start()
+        print(f"Using board hosted at {self.url}")
+
+
+###############################################################################
+# Board verifier
+# The checks live in board_plan.py, this sends the resulting plans to Trello.
+# Copies always name the new card themselves, so no step depends on another
+# step finishing first and the whole plan can be sent at once.
+def apply_plan(plan):
+    def apply_step(step):
+        params = dict(auth, **step["params"])
+        print(step["note"])
+        return Trello(step["method"],
+                      step["request"],
+                      params,
+                      None).get_response()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        return list(pool.map(apply_step, plan))
+
+
 ###############################################################################
 # Collect and organize the initial Trello data
+board_server = None
+board_client = None
+if server_mode == "host":
+    board_server = Board_Server(config["server"]["host"],
+                                config["server"]["port"],
+                                server_token)
+elif server_mode == "client":
+    board_client = Board_Client(config["server"]["url"], server_token)
+ui_queue = queue.Queue()
+# Loaded boards by team, so switching teams can redraw without waiting
+board_cache = {}
+cache_lock = threading.Lock()
+load_sequence = itertools.count()
 current_data = Trello_Data()
-sk_tracker = []
+roster_search = None
+sk_trackers = {team: [] for team in boards}
+sk_tracker = sk_trackers[active_team]
 
 
 ###############################################################################
@@ -167,11 +583,7 @@ def class_color(card):
     return color
 
 
-def refresh_tklists():
-    print("Refreshing lists...")
-    global_list.delete(0, "end")
-    main_list.delete(0, "end")
-    tier_list.delete(0, "end")
+def active_classes():
     active_filters = []
     for key, value in filters.items():
         if value.get() == 1:
@@ -180,13 +592,34 @@ def refresh_tklists():
         active_filters = ["druid", "hunter", "mage", "paladin",
                           "priest", "rogue", "shaman",
                           "warlock", "warrior"]
-    main_count = 0
-    tier_count = 0
-    for card in current_data.members:
+    return active_filters
+
+
+@tracer.traced("ui")
+def filter_roster(*args):
+    global_list.delete(0, "end")
+    for card in roster_search.search(search_var.get(), active_classes()):
         global_list.insert("end",
                            f"{card['name']} - ({card['labels'][0]['name']})")
         global_list.itemconfig("end", {"fg": config["colors"]["text"],
                                        "bg": class_color(card)})
+    return True
+
+
+@tracer.traced("ui")
+def refresh_tklists():
+    global roster_search
+    print("Refreshing lists...")
+    main_list.delete(0, "end")
+    tier_list.delete(0, "end")
+    active_filters = active_classes()
+    main_count = 0
+    tier_count = 0
+    # Only rebuild the search index when the board has been reloaded
+    if (roster_search is None or
+            roster_search.members is not current_data.members):
+        roster_search = Roster_Search(current_data.members)
+    filter_roster()
     try:
         for card in current_data.main_live_cards:
             if card["labels"][0]["name"].lower() in active_filters:
@@ -207,13 +640,16 @@ def refresh_tklists():
     except AttributeError:
         pass
     if main_count != tier_count:
-        print("WARNING: Asymmetrical counts between main and tier lists.")
+        print("WARNING: Asymmetrical counts between main and tier lists. "
+              "Use Verify lists for details.")
         main_count_label.config(fg="red")
         tier_count_label.config(fg="red")
-    main_count_label.config(text=(f"{config['trello']['main_live']}: "
+    main_count_label.config(text=(f"{board_config['main_live']}: "
                                   f"{main_count}"))
-    tier_count_label.config(text=(f"{config['trello']['tier_live']}: "
+    tier_count_label.config(text=(f"{board_config['tier_live']}: "
                                   f"{tier_count}"))
+    if board_server:
+        board_server.publish()
     print("Done refreshing.")
     return True
 
@@ -229,16 +665,113 @@ def check_lists():
         return False
 
 
+def post_log(message):
+    log_list.insert("end", message)
+    if board_server:
+        board_server.add_log(message)
+
+
+# Runs a button action on the host and redraws from the host's board
+def remote_op(op, *args):
+    result = board_client.run_op(op, *args)
+    sync_board()
+    return result
+
+
+@tracer.traced("ui")
+def sync_board(version=None):
+    global current_data, board_config
+    if version is not None and version == board_client.version:
+        return True
+    current_data = Trello_Data()
+    # Follow the host when it switches teams
+    if current_data.board != board_config:
+        board_config = current_data.board
+        show_team()
+    for message in board_client.read_log():
+        log_list.insert("end", message)
+    refresh_tklists()
+    return True
+
+
+def show_team():
+    local_label.config(text=(f"{board_config['main_live']}  |  "
+                             f"{board_config['tier_live']}  |  Filters"))
+    team_var.set(current_data.team)
+
+
+# Shows the team's cached board straight away and reloads it in the background
+@tracer.traced("action")
+def switch_team(team):
+    global active_team, board_config, current_data, sk_tracker
+    if board_client or team == active_team:
+        return False
+    active_team = team
+    board_config = boards[team]
+    sk_tracker = sk_trackers[team]
+    post_log(f"Team: {team}")
+    if team not in board_cache:
+        current_data = Trello_Data(team)
+        show_team()
+        refresh_tklists()
+        return True
+    current_data = board_cache[team]
+    show_team()
+    refresh_tklists()
+    load_board(team)
+    return True
+
+
+def load_board(team):
+    def load():
+        try:
+            Trello_Data(team)
+        except Exception as e:
+            print(e)
+            return
+        ui_queue.put((show_board, [team], None))
+    threading.Thread(target=load, daemon=True).start()
+
+
+def show_board(team):
+    global current_data
+    if team != active_team or board_cache[team] is current_data:
+        return False
+    current_data = board_cache[team]
+    show_team()
+    refresh_tklists()
+    return True
+
+
+# Runs work handed over by the server and client threads on the UI thread
+def process_queue():
+    while True:
+        try:
+            func, args, reply = ui_queue.get_nowait()
+        except queue.Empty:
+            break
+        try:
+            result = func(*args)
+        except Exception as e:
+            print(e)
+            result = False
+        if reply is not None:
+            reply.put(result)
+    window.after(50, process_queue)
+
+
+@tracer.traced("action")
 def create_lists():
     global current_data
+    if board_client:
+        return remote_op("create")
     current_data = Trello_Data()
-    qparams = auth
+    qparams = dict(auth)
     if check_lists():
-        log_list.insert("end",
-                        "Already exists: pull/live.")
+        post_log("Already exists: pull/live.")
         return False
-    qparams["idBoard"] = config['trello']['board_id']
-    qparams["name"] = config["trello"]["main_pull"]
+    qparams["idBoard"] = board_config['board_id']
+    qparams["name"] = board_config["main_pull"]
     qparams["idListSource"] = current_data.main_master_id
     qparams["pos"] = "bottom"
     print("Creating main pull list...")
@@ -246,7 +779,7 @@ def create_lists():
                    "/1/lists",
                    qparams,
                    None).get_response()
-    qparams["name"] = config["trello"]["tier_pull"]
+    qparams["name"] = board_config["tier_pull"]
     qparams["idListSource"] = current_data.tier_master_id
     qparams["pos"] = "bottom"
     print("Creating tier pull list...")
@@ -255,14 +788,14 @@ def create_lists():
                    qparams,
                    None).get_response()
     del qparams["idListSource"]
-    qparams["name"] = config["trello"]["main_live"]
+    qparams["name"] = board_config["main_live"]
     qparams["pos"] = "bottom"
     print("Creating main live list...")
     resp3 = Trello("POST",
                    "/1/lists",
                    qparams,
                    None).get_response()
-    qparams["name"] = config["trello"]["tier_live"]
+    qparams["name"] = board_config["tier_live"]
     qparams["pos"] = "bottom"
     print("Creating tier live list...")
     resp4 = Trello("POST",
@@ -274,81 +807,60 @@ def create_lists():
     refresh_tklists()
     print("Created: pull/live")
     event_log.info("Created: pull/live")
-    log_list.insert("end",
-                    "Created: pull/live")
+    post_log("Created: pull/live")
     return True
 
 
-def add_to_raid():
+@tracer.traced("action")
+def add_to_raid(names=None):
     global current_data
+    if names is None:
+        names = chosen_player("Extended")
+    if not names:
+        return False
+    if board_client:
+        return remote_op("add", names)
     current_data = Trello_Data()
     if not check_lists():
-        log_list.insert("end",
-                        "Missing: pull/live")
+        post_log("Missing: pull/live")
         return False
-    qparams = auth
-    for name in chosen_player("Extended"):
-        print(f"Adding {name} to live lists...")
-        try:
-            for card in current_data.main_pull_cards:
-                if card["name"] == name:
-                    main_card_id = card["id"]
-                    main_pos = card["pos"]
-                    break
-            for card in current_data.tier_pull_cards:
-                if card["name"] == name:
-                    tier_card_id = card["id"]
-                    tier_pos = card["pos"]
-                    break
-            if main_card_id and tier_card_id:
-                qparams["idList"] = current_data.main_live_id
-                qparams["idCardSource"] = main_card_id
-                qparams["pos"] = main_pos
-                resp1 = Trello("POST",
-                               "/1/cards",
-                               qparams,
-                               None).get_response()
-                qparams["idList"] = current_data.tier_live_id
-                qparams["idCardSource"] = tier_card_id
-                qparams["pos"] = tier_pos
-                resp2 = Trello("POST",
-                               "/1/cards",
-                               qparams,
-                               None).get_response()
-                del qparams["idList"], qparams["idCardSource"], qparams["pos"]
-                qparams["name"] = "-"
-                resp3 = Trello("PUT",
-                               f"/1/cards/{main_card_id}",
-                               qparams,
-                               None).get_response()
-                resp4 = Trello("PUT",
-                               f"/1/cards/{tier_card_id}",
-                               qparams,
-                               None).get_response()
-                del qparams["name"], main_card_id, tier_card_id
-                print(f"Added: {name}")
-                event_log.info(f"Added: {name}")
-                log_list.insert("end",
-                                f"Added: {name}")
-        except NameError:
-            print(f"Unable to add {name}. May have already been added.")
-            log_list.insert("end",
-                            f"Unable to add: {name}")
+    plan, players, skipped = plan_add(current_data, names)
+    for name in skipped:
+        print(f"Unable to add {name}. May have already been added.")
+        post_log(f"Unable to add: {name}")
+    print(f"Adding {len(set(players))} players to live lists...")
+    results = apply_plan(plan)
+    failed = {name for name, resp in zip(players, results)
+              if isinstance(resp, bytes)}
+    for name in dict.fromkeys(players):
+        if name in failed:
+            print(f"Unable to add {name}. Check the lists with Verify lists.")
+            post_log(f"Unable to add: {name}")
             continue
+        print(f"Added: {name}")
+        record_history("add", name)
+        event_log.info(f"Added: {name}")
+        post_log(f"Added: {name}")
     current_data = Trello_Data()
     refresh_tklists()
     return True
 
 
-def remove_from_raid():
+@tracer.traced("action")
+def remove_from_raid(names=None):
     global current_data
+    if names is None:
+        names = chosen_player("Extended")
+    if not names:
+        return False
+    if board_client:
+        return remote_op("remove", names)
     current_data = Trello_Data()
     if not check_lists():
-        log_list.insert("end",
-                        "Missing: pull/live")
+        post_log("Missing: pull/live")
         return False
-    qparams = auth
-    for name in chosen_player("Extended"):
+    qparams = dict(auth)
+    for name in names:
         print(f"Removing {name} from live lists...")
         main_count = 0
         tier_count = 0
@@ -403,36 +915,43 @@ def remove_from_raid():
                                None).get_response()
                 del main_live_card_id, tier_live_card_id
                 print(f"Removed: {name}")
+                record_history("remove", name)
                 event_log.info(f"Removed: {name}")
-                log_list.insert("end",
-                                f"Removed: {name}")
+                post_log(f"Removed: {name}")
         except NameError:
             print(f"Unable to remove {name}. May have already been removed.")
-            log_list.insert("end",
-                            f"Unable to remove {name}.")
+            post_log(f"Unable to remove {name}.")
             continue
     current_data = Trello_Data()
     refresh_tklists()
     return True
 
 
-def mainsk():
+@tracer.traced("action")
+def mainsk(name=None):
     global current_data
-    if chosen_player("Single") is not False:
-        suicide(chosen_player("Single"), "Main")
-    else:
+    if name is None:
+        name = chosen_player("Single")
+    if name is False:
         return False
+    if board_client:
+        return remote_op("mainsk", name)
+    suicide(name, "Main")
     current_data = Trello_Data()
     refresh_tklists()
     return True
 
 
-def tiersk():
+@tracer.traced("action")
+def tiersk(name=None):
     global current_data
-    if chosen_player("Single") is not False:
-        suicide(chosen_player("Single"), "Tier")
-    else:
+    if name is None:
+        name = chosen_player("Single")
+    if name is False:
         return False
+    if board_client:
+        return remote_op("tiersk", name)
+    suicide(name, "Tier")
     current_data = Trello_Data()
     refresh_tklists()
     return True
@@ -450,8 +969,7 @@ def chosen_player(limit_type):
             slist = tier_list
             selection = tier_list.curselection()
         else:
-            log_list.insert("end",
-                            "Requires 1 selection.")
+            post_log("Requires 1 selection.")
             return False
         name = slist.get(selection)[:slist.get(selection).index(" ")]
         return name
@@ -473,17 +991,24 @@ def chosen_player(limit_type):
                                  [:slist.get(label).index(" ")])
                 return names
         except UnboundLocalError:
-            log_list.insert("end",
-                            "No player selected.")
+            post_log("No player selected.")
             return False
 
 
+def live_position(cards, name):
+    for i, card in enumerate(cards):
+        if card["name"] == name:
+            return {"player_class": card["labels"][0]["name"],
+                    "position": i + 1,
+                    "size": len(cards)}
+    return {}
+
+
 def suicide(name, sklist):
     if not check_lists():
-        log_list.insert("end",
-                        "Missing: pull/live")
+        post_log("Missing: pull/live")
         return False
-    qparams = auth
+    qparams = dict(auth)
     if sklist == "Main":
         for card in current_data.main_live_cards:
             if card["name"] == name:
@@ -506,14 +1031,14 @@ def suicide(name, sklist):
             del qparams["pos"]
         except KeyError:
             print(f"{name} not on live lists.")
-            log_list.insert("end",
-                            f"{name} not on live lists.")
+            post_log(f"{name} not on live lists.")
             return False
         sk_tracker.append(sk_data)
+        record_history("main_sk", name,
+                       **live_position(current_data.main_live_cards, name))
         event_log.info(f"Main SK: {name}")
         print(f"Main SK: {name}")
-        log_list.insert("end",
-                        f"Main SK: {name}")
+        post_log(f"Main SK: {name}")
         return True
     if sklist == "Tier":
         for card in current_data.main_live_cards:
@@ -535,20 +1060,23 @@ def suicide(name, sklist):
                 break
         del qparams["pos"]
         sk_tracker.append(sk_data)
+        record_history("tier_sk", name,
+                       **live_position(current_data.tier_live_cards, name))
         event_log.info(f"Tier SK: {name}")
         print(f"Tier SK: {name}")
-        log_list.insert("end",
-                        f"Tier SK: {name}")
+        post_log(f"Tier SK: {name}")
         return True
 
 
+@tracer.traced("action")
 def undosk():
+    if board_client:
+        return remote_op("undo")
     if len(sk_tracker) == 0:
-        log_list.insert("end",
-                        "No SK to undo.")
+        post_log("No SK to undo.")
         return False
     global current_data
-    qparams = auth
+    qparams = dict(auth)
     qparams["pos"] = sk_tracker[-1]["main_pos"]
     print(f"Undo SK: {sk_tracker[-1]}")
     resp1 = Trello("PUT",
@@ -561,25 +1089,27 @@ def undosk():
                    qparams,
                    None).get_response()
     del qparams["pos"]
+    record_history("undo", sk_tracker[-1]["name"])
     event_log.info(f"SK undone: {sk_tracker[-1]['name']}")
     print(f"SK undone: {sk_tracker[-1]['name']}")
-    log_list.insert("end",
-                    f"SK undone: {sk_tracker[-1]['name']}")
+    post_log(f"SK undone: {sk_tracker[-1]['name']}")
     sk_tracker.pop(-1)
     current_data = Trello_Data()
     refresh_tklists()
     return True
 
 
+@tracer.traced("action")
 def merge_lists():
     global current_data
+    if board_client:
+        return remote_op("merge")
     if not check_lists():
-        log_list.insert("end",
-                        "Missing: pull/live")
+        post_log("Missing: pull/live")
         return False
     print("Merging Live lists into Pull lists...\n"
           "This can take a while...")
-    qparams = auth
+    qparams = dict(auth)
     try:
         i = 0
         while len(current_data.main_live_cards) > 0:
@@ -643,13 +1173,180 @@ def merge_lists():
         pass
     del qparams["value"]
     print("Merged: live lists")
+    record_history("merge")
     event_log.info("Merged: live lists")
-    log_list.insert("end",
-                    "Merged: live lists")
+    post_log("Merged: live lists")
     refresh_tklists()
     return True
 
 
+@tracer.traced("action")
+def verify_lists():
+    global current_data
+    current_data = Trello_Data()
+    if not check_lists():
+        post_log("Missing: pull/live")
+        return False
+    problems, plan = verify_board(current_data)
+    if not problems:
+        post_log("Verified: pull/live")
+        return True
+    for problem in problems:
+        print(problem)
+        post_log(problem)
+    if plan and messagebox.askyesno("Repair lists",
+                                    f"Found {len(problems)} problems.\n"
+                                    f"Apply {len(plan)} repairs?"):
+        return repair_lists()
+    return False
+
+
+@tracer.traced("action")
+def repair_lists():
+    global current_data
+    if board_client:
+        return remote_op("repair")
+    current_data = Trello_Data()
+    if not check_lists():
+        post_log("Missing: pull/live")
+        return False
+    problems, plan = verify_board(current_data)
+    print(f"Applying {len(plan)} repairs...")
+    results = apply_plan(plan)
+    failed = len([resp for resp in results if isinstance(resp, bytes)])
+    event_log.info(f"Repaired: {len(plan) - failed} of {len(plan)}")
+    post_log(f"Repaired: {len(plan) - failed} of {len(plan)}")
+    current_data = Trello_Data()
+    refresh_tklists()
+    return failed == 0
+
+
+def import_roster():
+    dialog = Toplevel(window)
+    dialog.title("Import roster")
+    dialog.config(bg="#202533")
+    roster_label = Label(dialog, bg="#202533", fg="#ffffff",
+                         text="One name per line or CSV")
+    roster_text = Text(dialog, bg="#202533", fg="#ffffff",
+                       font=("Helvetica", 12), height=20, width=30,
+                       insertbackground="#ffffff")
+    load_roster_button = Button(dialog, bg="#2c3b47", fg="#ffffff",
+                                command=lambda: load_roster(roster_text),
+                                text="Load file", width=25)
+    add_roster_button = Button(dialog, bg="#2c3b47", fg="#ffffff",
+                               command=lambda: add_roster(dialog,
+                                                          roster_text),
+                               text="Add raid", width=25)
+    roster_label.pack()
+    roster_text.pack()
+    load_roster_button.pack(pady=5)
+    add_roster_button.pack(pady=5)
+    return True
+
+
+def load_roster(roster_text):
+    path = filedialog.askopenfilename(filetypes=[("Roster", "*.txt *.csv"),
+                                                 ("All files", "*.*")])
+    if not path:
+        return False
+    with open(path, encoding="utf-8-sig") as f:
+        roster_text.delete("1.0", "end")
+        roster_text.insert("1.0", f.read())
+    return True
+
+
+@tracer.traced("action")
+def add_roster(dialog, roster_text):
+    names, unresolved = resolve_roster(roster_text.get("1.0", "end"),
+                                       current_data.main_master_cards)
+    for raw in unresolved:
+        print(f"Unknown player: {raw}")
+        post_log(f"Unknown player: {raw}")
+    dialog.destroy()
+    if not names:
+        return False
+    return add_to_raid(names)
+
+
+def export_trace():
+    path = filedialog.asksaveasfilename(defaultextension=".json",
+                                        initialfile="trace.json")
+    if not path:
+        return False
+    count = tracer.export(path)
+    print(f"Exported {count} trace events to {path}")
+    post_log(f"Exported trace: {count} events")
+    return True
+
+
+def toggle_profile():
+    if tracer.toggle_profile("profile.prof"):
+        debug_menu.entryconfig(1, label="Stop profiling")
+        post_log("Profiling started")
+    else:
+        debug_menu.entryconfig(1, label="Start profiling")
+        post_log("Profile saved: profile.prof")
+    return True
+
+
+# analytics.py needs numpy, so it is only imported when a report is asked for
+def load_analytics():
+    try:
+        import analytics
+    except ImportError as e:
+        print(e)
+        post_log("Reports need numpy")
+        return None
+    histories = analytics.load_teams(history_fn, "events.log")
+    # The active team's report comes first
+    histories = sorted(histories.values(),
+                       key=lambda history: history.team != active_team)
+    return histories, analytics
+
+
+def sk_report():
+    loaded = load_analytics()
+    if not loaded:
+        return False
+    histories, analytics = loaded
+    dialog = Toplevel(window)
+    dialog.title("SK report")
+    dialog.config(bg="#202533")
+    report_text = Text(dialog, bg="#202533", fg="#ffffff",
+                       font=("Courier", 11), height=40, width=60)
+    report_text.insert("1.0", "\n\n".join(analytics.report(history)
+                                           for history in histories))
+    report_text.config(state="disabled")
+    report_text.pack()
+    return True
+
+
+def export_sk_stats():
+    loaded = load_analytics()
+    if not loaded:
+        return False
+    histories, analytics = loaded
+    path = filedialog.asksaveasfilename(defaultextension=".csv",
+                                        initialfile="sk_stats.csv")
+    if not path:
+        return False
+    count = analytics.export_csv(histories, path)
+    print(f"Exported {count} players to {path}")
+    post_log(f"Exported SK stats: {count} players")
+    return True
+
+
+# Button actions a client may ask the host to run
+SERVER_OPS = {"create": create_lists,
+              "add": add_to_raid,
+              "remove": remove_from_raid,
+              "mainsk": mainsk,
+              "tiersk": tiersk,
+              "undo": undosk,
+              "merge": merge_lists,
+              "repair": repair_lists}
+
+
 ###############################################################################
 # Configure tkinter window
 window = Tk()
@@ -659,10 +1356,30 @@ window.title("Whiteclaw Clan Loot Master")
 canvas = Canvas(window, bg="#202533", width=100, height=100)
 img = PhotoImage(file="logo100x100.gif")
 canvas.create_image(50, 50, anchor="center", image=img)
+team_var = StringVar(value=active_team)
+team_menu = OptionMenu(window, team_var, *boards, command=switch_team)
+team_menu.config(bg="#2c3b47", fg="#ffffff", width=22,
+                 highlightthickness=0)
+menu_bar = Menu(window)
+debug_menu = Menu(menu_bar, tearoff=0)
+debug_menu.add_command(label="Export trace...", command=export_trace)
+debug_menu.add_command(label="Start profiling", command=toggle_profile)
+menu_bar.add_cascade(label="Debug", menu=debug_menu)
+reports_menu = Menu(menu_bar, tearoff=0)
+reports_menu.add_command(label="SK report", command=sk_report)
+reports_menu.add_command(label="Export SK stats...", command=export_sk_stats)
+menu_bar.add_cascade(label="Reports", menu=reports_menu)
+window.config(menu=menu_bar)
 
 # Global Frame
 global_label = Label(window, bg="#202533", fg="#ffffff",
                      text="Global List  |  Log  |  Controls")
+search_var = StringVar()
+search_var.trace_add("write", filter_roster)
+search_entry = Entry(window, bg="#2c3b47", fg="#ffffff",
+                     font=("Helvetica", 12), width=25,
+                     insertbackground="#ffffff",
+                     textvariable=search_var)
 global_frame = Frame(window, bg="#202533", borderwidth=5,
                      relief="sunken")
 global_list = Listbox(global_frame, bg="#202533", fg="#ffffff",
@@ -685,8 +1402,8 @@ log_list.config(yscrollcommand=ll_scrollbar.set)
 
 # Live Lists Frame
 local_label = Label(window, bg="#202533", fg="#ffffff",
-                    text=(f"{config['trello']['main_live']}  |  "
-                          f"{config['trello']['tier_live']}  |  Filters"))
+                    text=(f"{board_config['main_live']}  |  "
+                          f"{board_config['tier_live']}  |  Filters"))
 main_frame = Frame(window, bg="#202533", borderwidth=5, relief="raised")
 main_list = Listbox(main_frame, bg="#202533", fg="#ffffff",
                     font=("Helvetica", 12), height=20, width=25,
@@ -710,6 +1427,9 @@ create_pl_button = Button(global_frame, bg="#2c3b47", fg="#ffffff",
 add_button = Button(global_frame, bg="#2c3b47", fg="#ffffff",
                     command=add_to_raid,
                     text="Add player", width=25)
+import_button = Button(global_frame, bg="#2c3b47", fg="#ffffff",
+                       command=import_roster,
+                       text="Import roster", width=25)
 remove_button = Button(global_frame, bg="#2c3b47", fg="#ffffff",
                        command=remove_from_raid,
                        text="Remove player", width=25)
@@ -725,59 +1445,71 @@ undo_button = Button(global_frame, bg="#2c3b47", fg="#ffffff",
 merge_button = Button(global_frame, bg="#2c3b47", fg="#ffffff",
                       command=merge_lists,
                       text="Merge lists", width=25)
+verify_button = Button(global_frame, bg="#2c3b47", fg="#ffffff",
+                       command=verify_lists,
+                       text="Verify lists", width=25)
 filters = {"druid": IntVar(), "hunter": IntVar(), "mage": IntVar(),
            "paladin": IntVar(), "priest": IntVar(), "rogue": IntVar(),
            "shaman": IntVar(), "warlock": IntVar(), "warrior": IntVar()}
 druid_filter = Checkbutton(main_frame, text="Druid",
                            variable=filters["druid"],
+                           command=filter_roster,
                            bg=config["colors"]["druid"], fg="#000000",
                            font=("Helvetica", 12),
                            height=1, width=15, anchor="w",
                            highlightcolor="#D94A66")
 hunter_filter = Checkbutton(main_frame, text="Hunter",
                             variable=filters["hunter"],
+                            command=filter_roster,
                             bg=config["colors"]["hunter"], fg="#000000",
                             font=("Helvetica", 12),
                             height=1, width=15, anchor="w",
                             highlightcolor="#D94A66")
 mage_filter = Checkbutton(main_frame, text="Mage",
                           variable=filters["mage"],
+                          command=filter_roster,
                           bg=config["colors"]["mage"], fg="#000000",
                           font=("Helvetica", 12),
                           height=1, width=15, anchor="w",
                           highlightcolor="#D94A66")
 paladin_filter = Checkbutton(main_frame, text="Paladin",
                           variable=filters["paladin"],
+                          command=filter_roster,
                           bg=config["colors"]["paladin"], fg="#000000",
                           font=("Helvetica", 12),
                           height=1, width=15, anchor="w",
                           highlightcolor="#D94A66")
 priest_filter = Checkbutton(main_frame, text="Priest",
                             variable=filters["priest"],
+                            command=filter_roster,
                             bg=config["colors"]["priest"], fg="#000000",
                             font=("Helvetica", 12),
                             height=1, width=15, anchor="w",
                             highlightcolor="#D94A66")
 rogue_filter = Checkbutton(main_frame, text="Rogue",
                            variable=filters["rogue"],
+                           command=filter_roster,
                            bg=config["colors"]["rogue"], fg="#000000",
                            font=("Helvetica", 12),
                            height=1, width=15, anchor="w",
                            highlightcolor="#D94A66")
 shaman_filter = Checkbutton(main_frame, text="Shaman",
                             variable=filters["shaman"],
+                            command=filter_roster,
                             bg=config["colors"]["shaman"], fg="#000000",
                             font=("Helvetica", 12),
                             height=1, width=15, anchor="w",
                             highlightcolor="#D94A66")
 warlock_filter = Checkbutton(main_frame, text="Warlock",
                              variable=filters["warlock"],
+                             command=filter_roster,
                              bg=config["colors"]["warlock"], fg="#000000",
                              font=("Helvetica", 12),
                              height=1, width=15, anchor="w",
                              highlightcolor="#D94A66")
 warrior_filter = Checkbutton(main_frame, text="Warrior",
                              variable=filters["warrior"],
+                             command=filter_roster,
                              bg=config["colors"]["warrior"], fg="#000000",
                              font=("Helvetica", 12),
                              height=1, width=15, anchor="w",
@@ -786,13 +1518,16 @@ apply_filters = Button(main_frame, bg="#2c3b47", fg="#ffffff",
                        command=refresh_tklists,
                        text="Filter/Refresh", width=25)
 main_count_label = Label(main_frame, bg="#202533", fg="#ffffff",
-                         text=f"{config['trello']['main_live']}: 0")
+                         text=f"{board_config['main_live']}: 0")
 tier_count_label = Label(main_frame, bg="#202533", fg="#ffffff",
-                         text=f"{config['trello']['tier_live']}: 0")
+                         text=f"{board_config['tier_live']}: 0")
 
 # Global List Frame
 canvas.pack()
+if len(boards) > 1 and not board_client:
+    team_menu.pack(pady=5)
 global_label.pack()
+search_entry.pack(pady=5)
 global_frame.pack()
 global_list.pack(fill="y", side="left")
 gl_scrollbar.pack(fill="y", side="left")
@@ -800,11 +1535,13 @@ log_list.pack(side="left", fill="y")
 ll_scrollbar.pack(side="left", fill="y")
 create_pl_button.pack(pady=5)
 add_button.pack(pady=5)
+import_button.pack(pady=5)
 remove_button.pack(pady=5)
 mainsk_button.pack(pady=5)
 tiersk_button.pack(pady=5)
 undo_button.pack(pady=5)
 merge_button.pack(pady=5)
+verify_button.pack(pady=5)
 
 # Live Lists Frame
 local_label.pack()
@@ -831,6 +1568,17 @@ tier_count_label.pack()
 # Main logic
 def main():
     refresh_tklists()
+    if board_server:
+        board_server.start()
+    if board_client:
+        board_client.start()
+    else:
+        # Load the other teams' boards now so the first switch is instant
+        for team in boards:
+            if team != active_team:
+                threading.Thread(target=Trello_Data, args=[team],
+                                 daemon=True).start()
+    process_queue()
     window.mainloop()
 
 
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+
+import csv
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+
+###############################################################################
+# SK analytics
+# Loads the operation history into columnar NumPy arrays and works out how
+# long players wait between SKs, where each class sits when it SKs and how
+# fast players climb the lists per raid attended.
+#
+# Each raid team gets its own statistics, rows without a team (events.log and
+# history written before teams were recorded) are grouped together.
+#
+# Usage: python analytics.py [history.jsonl] [events.log] [--team name]
+#                            [--csv stats.csv]
+EVENTS = ["main_sk", "tier_sk", "add", "remove", "merge"]
+LOG_EVENTS = {"Main SK": "main_sk",
+              "Tier SK": "tier_sk",
+              "Added": "add",
+              "Removed": "remove",
+              "SK undone": "undo",
+              "Merged": "merge"}
+LOG_LINE = re.compile(r"^(\S+ \S+) - INFO - "
+                      r"(Main SK|Tier SK|Added|Removed|SK undone|Merged): "
+                      r"(.*)$")
+DAY = 86400
+
+
+# Rows written by record_history in __main__.py
+def read_history(path):
+    rows = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                rows.append(json.loads(line))
+    return rows
+
+
+# Older raids only have events.log, which has no positions or classes
+def read_event_log(path):
+    rows = []
+    with open(path) as f:
+        for line in f:
+            match = LOG_LINE.match(line.strip())
+            if not match:
+                continue
+            stamp, event, name = match.groups()
+            event = LOG_EVENTS[event]
+            rows.append({"time": datetime.strptime(
+                             stamp, "%Y-%m-%d %H:%M:%S,%f").timestamp(),
+                         "event": event,
+                         "name": None if event == "merge" else name})
+    return rows
+
+
+# Drops each undone SK along with the undo itself
+def apply_undos(rows):
+    kept = []
+    for row in sorted(rows, key=lambda row: row["time"]):
+        if row["event"] != "undo":
+            kept.append(row)
+            continue
+        for i in range(len(kept) - 1, -1, -1):
+            if (kept[i]["event"] in ("main_sk", "tier_sk") and
+                    kept[i]["name"] == row["name"]):
+                del kept[i]
+                break
+    return kept
+
+
+class History:
+    def __init__(self, rows, team=None):
+        self.team = team
+        self.names = sorted({row["name"] for row in rows if row["name"]})
+        codes = {name: i for i, name in enumerate(self.names)}
+        player_classes = {}
+        for row in rows:
+            if row.get("player_class"):
+                player_classes[row["name"]] = row["player_class"]
+        self.classes = sorted(set(player_classes.values()))
+        class_codes = {name: i for i, name in enumerate(self.classes)}
+        self.player_class = np.array([class_codes.get(player_classes.get(
+                                          name), -1) for name in self.names],
+                                     dtype=np.int16)
+
+        self.time = np.array([row["time"] for row in rows], dtype=float)
+        self.event = np.array([EVENTS.index(row["event"]) for row in rows],
+                              dtype=np.int8)
+        self.player = np.array([codes.get(row["name"], -1) for row in rows],
+                               dtype=np.int64)
+        self.position = np.array([row.get("position", np.nan)
+                                  for row in rows], dtype=float)
+        self.size = np.array([row.get("size", np.nan) for row in rows],
+                             dtype=float)
+
+        # Raids that run past midnight still count as one raid day
+        offset = time.localtime().tm_gmtoff - DAY // 2
+        self.day = np.floor((self.time + offset) / DAY).astype(np.int64)
+        if len(self.day):
+            self.day -= self.day.min()
+        self.span = int(self.day.max()) + 2 if len(self.day) else 1
+
+        # One sorted key per (player, raid day) a player was added to a raid
+        added = self.event == EVENTS.index("add")
+        self.attended = np.unique(self.player[added] * self.span +
+                                  self.day[added])
+
+    def group_mean(self, groups, values, size=None):
+        size = len(self.names) if size is None else size
+        counts = np.bincount(groups, minlength=size)
+        totals = np.bincount(groups, weights=values, minlength=size)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return totals / counts
+
+    def sks(self, event, positioned=False):
+        mask = self.event == EVENTS.index(event)
+        if positioned:
+            mask &= ~np.isnan(self.position)
+        order = np.lexsort((self.time[mask], self.player[mask]))
+        return {"player": self.player[mask][order],
+                "time": self.time[mask][order],
+                "day": self.day[mask][order],
+                "position": self.position[mask][order],
+                "size": self.size[mask][order]}
+
+    def attendance(self):
+        return np.bincount(self.attended // self.span,
+                           minlength=len(self.names))
+
+    def sk_counts(self, event):
+        return np.bincount(self.sks(event)["player"],
+                           minlength=len(self.names))
+
+    # Mean days between a player's consecutive SKs on one list
+    def waits(self, event):
+        sk = self.sks(event)
+        same = sk["player"][1:] == sk["player"][:-1]
+        gaps = np.diff(sk["time"])[same] / DAY
+        return self.group_mean(sk["player"][1:][same], gaps)
+
+    def positions(self, event):
+        sk = self.sks(event, positioned=True)
+        return self.group_mean(sk["player"], sk["position"])
+
+    def class_positions(self, event):
+        sk = self.sks(event, positioned=True)
+        player_class = self.player_class[sk["player"]]
+        known = player_class >= 0
+        return self.group_mean(player_class[known], sk["position"][known],
+                               len(self.classes))
+
+    # Share of the list a player climbs per raid attended between two SKs.
+    # A player lands at the bottom after an SK, so the climb is how far from
+    # the bottom they were at their next SK.
+    def drift(self, event):
+        sk = self.sks(event, positioned=True)
+        same = sk["player"][1:] == sk["player"][:-1]
+        size = np.maximum(sk["size"][1:] - 1, 1)
+        climb = 1 - (sk["position"][1:] - 1) / size
+        player = sk["player"][1:]
+        raids = (np.searchsorted(self.attended,
+                                 player * self.span + sk["day"][1:],
+                                 side="right") -
+                 np.searchsorted(self.attended,
+                                 player * self.span + sk["day"][:-1],
+                                 side="right"))
+        rate = climb / np.maximum(raids, 1)
+        return self.group_mean(player[same], rate[same])
+
+    def player_stats(self):
+        return {"name": np.array(self.names, dtype=object),
+                "class": np.array([self.classes[i] if i >= 0 else ""
+                                   for i in self.player_class],
+                                  dtype=object),
+                "raids": self.attendance(),
+                "main_sks": self.sk_counts("main_sk"),
+                "tier_sks": self.sk_counts("tier_sk"),
+                "main_wait_days": self.waits("main_sk"),
+                "tier_wait_days": self.waits("tier_sk"),
+                "main_position": self.positions("main_sk"),
+                "tier_position": self.positions("tier_sk"),
+                "main_drift": self.drift("main_sk"),
+                "tier_drift": self.drift("tier_sk")}
+
+
+# events.log keeps logging after history.jsonl starts, so it only fills in the
+# raids from before the first history row
+def read_rows(history_fn, log_fn):
+    rows = read_history(history_fn) if os.path.exists(history_fn) else []
+    if os.path.exists(log_fn):
+        start = min((row["time"] for row in rows), default=np.inf)
+        rows = [row for row in read_event_log(log_fn)
+                if row["time"] < start] + rows
+    return rows
+
+
+def load(history_fn="history.jsonl", log_fn="events.log", team=None):
+    rows = [row for row in read_rows(history_fn, log_fn)
+            if row.get("team") == team]
+    return History(apply_undos(rows), team)
+
+
+def load_teams(history_fn="history.jsonl", log_fn="events.log"):
+    teams = {}
+    for row in read_rows(history_fn, log_fn):
+        teams.setdefault(row.get("team"), []).append(row)
+    return {team: History(apply_undos(rows), team)
+            for team, rows in teams.items()}
+
+
+def fmt(value, digits=1):
+    return "-" if np.isnan(value) else f"{value:.{digits}f}"
+
+
+def report(history, top=10):
+    lines = [f"Team: {history.team or 'Not recorded'}",
+             f"Events: {len(history.time)}  "
+             f"Players: {len(history.names)}  "
+             f"Raids: {len(np.unique(history.day))}"]
+    stats = history.player_stats()
+    for sklist in ("main", "tier"):
+        lines.append("")
+        lines.append(f"{sklist.title()} SKs: {stats[f'{sklist}_sks'].sum()}")
+        lines.append("Average position by class:")
+        for name, position in zip(history.classes,
+                                  history.class_positions(f"{sklist}_sk")):
+            lines.append(f"  {name:<10}{fmt(position):>8}")
+        waits = stats[f"{sklist}_wait_days"]
+        lines.append("Longest average wait between SKs (days):")
+        for i in np.argsort(np.nan_to_num(-waits, nan=np.inf))[:top]:
+            if np.isnan(waits[i]):
+                break
+            lines.append(f"  {history.names[i]:<14}{fmt(waits[i]):>8}  "
+                         f"raids {stats['raids'][i]}")
+        drift = stats[f"{sklist}_drift"]
+        lines.append("Slowest climb per raid attended (share of list):")
+        for i in np.argsort(np.nan_to_num(drift, nan=np.inf))[:top]:
+            if np.isnan(drift[i]):
+                break
+            lines.append(f"  {history.names[i]:<14}{fmt(drift[i], 3):>8}")
+    return "\n".join(lines)
+
+
+# One row per player per team
+def export_csv(histories, path):
+    count = 0
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        for i, history in enumerate(histories):
+            stats = history.player_stats()
+            if i == 0:
+                writer.writerow(["team"] + list(stats.keys()))
+            for row in zip(*stats.values()):
+                writer.writerow([history.team or ""] +
+                                [fmt(value, 3) if isinstance(value, float)
+                                 else value for value in row])
+                count += 1
+    return count
+
+
+def option(args, flag):
+    if flag not in args:
+        return None
+    value = args[args.index(flag) + 1]
+    del args[args.index(flag):args.index(flag) + 2]
+    return value
+
+
+def main(args):
+    csv_fn = option(args, "--csv")
+    team = option(args, "--team")
+    if team:
+        histories = [load(*args, team=team)]
+    else:
+        histories = list(load_teams(*args).values())
+    print("\n\n".join(report(history) for history in histories))
+    if csv_fn:
+        print(f"Exported {export_csv(histories, csv_fn)} players to {csv_fn}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+import csv
+import difflib
+import unicodedata
+
+
+###############################################################################
+# Board plans
+# Pure planning code for the loot lists. Functions here only read board data
+# and return lists of Trello writes, so they can be tested without Trello.
+#
+# Every player on a master list should be on exactly one of its pull or live
+# lists, every live card should leave a "-" placeholder on the pull list and
+# both live lists should hold the same players.
+def index_cards(cards):
+    names = {}
+    for card in cards:
+        names.setdefault(card["name"], []).append(card)
+    return names
+
+
+def repair_step(method, request, params, note):
+    return {"method": method, "request": request,
+            "params": params, "note": note}
+
+
+def verify_board(data):
+    problems = []
+    plan = []
+    sides = {}
+    data_live = {}
+    orphans = {}
+    for side in ("main", "tier"):
+        # A "-" on a live list is a copy that picked up its source's rename
+        cards = getattr(data, f"{side}_live_cards", [])
+        live = [card for card in cards if card["name"] != "-"]
+        orphans[side] = [card for card in cards if card["name"] == "-"]
+        data_live[side] = live
+        pull = getattr(data, f"{side}_pull_cards", [])
+        sides[side] = {"master": index_cards(
+                           getattr(data, f"{side}_master_cards", [])),
+                       "pull": index_cards(pull),
+                       "live": index_cards(live),
+                       "live_count": len(live),
+                       "placeholders": [card for card in pull
+                                        if card["name"] == "-"],
+                       "renamed": set()}
+
+    # Players on one live list but not the other
+    for side, other in (("main", "tier"), ("tier", "main")):
+        live_name = data.board[f"{other}_live"]
+        for name in sides[side]["live"]:
+            if name in sides[other]["live"]:
+                continue
+            problems.append(f"Missing from {live_name}: {name}")
+            source = (sides[other]["pull"].get(name) or
+                      sides[other]["master"].get(name))
+            if not source:
+                continue
+            card = source[0]
+            plan.append(repair_step("POST", "/1/cards",
+                                    {"idList": getattr(data,
+                                                       f"{other}_live_id"),
+                                     "idCardSource": card["id"],
+                                     "name": name,
+                                     "pos": card["pos"]},
+                                    f"Add {name} to {live_name}"))
+            if card["idList"] == getattr(data, f"{other}_pull_id"):
+                plan.append(repair_step("PUT", f"/1/cards/{card['id']}",
+                                        {"name": "-"},
+                                        f"Leave placeholder for {name}"))
+                sides[other]["renamed"].add(card["id"])
+            sides[other]["live_count"] += 1
+
+    for side, lists in sides.items():
+        pull_name = data.board[f"{side}_pull"]
+        live_name = data.board[f"{side}_live"]
+        added = set(sides["main" if side == "tier" else "tier"]["live"])
+        for card in orphans[side]:
+            problems.append(f"Placeholder on {live_name}")
+            plan.append(repair_step("DELETE", f"/1/cards/{card['id']}",
+                                    {}, "Remove orphan placeholder"))
+        for name, cards in lists["live"].items():
+            for card in cards[1:]:
+                problems.append(f"Duplicate on {live_name}: {name}")
+                plan.append(repair_step("DELETE", f"/1/cards/{card['id']}",
+                                        {}, f"Remove extra {name}"))
+                lists["live_count"] -= 1
+        for name, cards in lists["pull"].items():
+            if name == "-":
+                continue
+            cards = [card for card in cards
+                     if card["id"] not in lists["renamed"]]
+            extra = cards[1:]
+            if name in lists["live"]:
+                # The live copy was made but the pull card was never renamed
+                problems.append(f"On both {pull_name} and {live_name}: "
+                                f"{name}")
+                plan.append(repair_step("PUT", f"/1/cards/{cards[0]['id']}",
+                                        {"name": "-"},
+                                        f"Leave placeholder for {name}"))
+                lists["renamed"].add(cards[0]["id"])
+            elif name in added:
+                # Copied onto this live list above, so no pull card should stay
+                extra = cards
+            for card in extra:
+                problems.append(f"Duplicate on {pull_name}: {name}")
+                plan.append(repair_step("DELETE", f"/1/cards/{card['id']}",
+                                        {}, f"Remove extra {name}"))
+        for name, cards in lists["master"].items():
+            if (name in lists["pull"] or name in lists["live"] or
+                    name in added):
+                continue
+            problems.append(f"Missing from {pull_name} and {live_name}: "
+                            f"{name}")
+            plan.append(repair_step("POST", "/1/cards",
+                                    {"idList": getattr(data,
+                                                       f"{side}_pull_id"),
+                                     "idCardSource": cards[0]["id"],
+                                     "pos": cards[0]["pos"]},
+                                    f"Restore {name} to {pull_name}"))
+        for name in sorted(set(lists["pull"]) | set(lists["live"])):
+            if name != "-" and name not in lists["master"]:
+                problems.append(f"Not on master list: {name}")
+
+        # One placeholder per live card
+        if len(lists["placeholders"]) != len(data_live[side]):
+            problems.append(f"{pull_name} has "
+                            f"{len(lists['placeholders'])} placeholders for "
+                            f"{len(data_live[side])} live players")
+        placeholders = len(lists["placeholders"]) + len(lists["renamed"])
+        keep = max(lists["live_count"] - len(lists["renamed"]), 0)
+        for card in lists["placeholders"][keep:]:
+            plan.append(repair_step("DELETE", f"/1/cards/{card['id']}",
+                                    {}, "Remove orphan placeholder"))
+        for i in range(lists["live_count"] - placeholders):
+            plan.append(repair_step("POST", "/1/cards",
+                                    {"idList": getattr(data,
+                                                       f"{side}_pull_id"),
+                                     "name": "-",
+                                     "pos": "bottom"},
+                                    f"Add placeholder to {pull_name}"))
+    return problems, plan
+
+
+###############################################################################
+# Roster import
+# Lowercase and drop accents and realm names so "Zúl-Stalagg" matches "Zul"
+def normalize_name(name):
+    name = name.strip().split("-")[0]
+    name = unicodedata.normalize("NFKD", name)
+    return "".join(c for c in name if not unicodedata.combining(c)).lower()
+
+
+def roster_index(cards):
+    return {normalize_name(card["name"]): card["name"] for card in cards}
+
+
+# Accepts one name per line or CSV with the name in the first column
+def parse_roster(text):
+    names = []
+    for row in csv.reader(text.splitlines()):
+        if not row or not row[0].strip():
+            continue
+        if row[0].strip().lower() in ("name", "player"):
+            continue
+        names.append(row[0].strip())
+    return names
+
+
+def resolve_roster(text, cards):
+    index = roster_index(cards)
+    resolved = []
+    unresolved = []
+    for raw in parse_roster(text):
+        key = normalize_name(raw)
+        if key not in index:
+            close = difflib.get_close_matches(key, index, n=1, cutoff=0.8)
+            if not close:
+                unresolved.append(raw)
+                continue
+            print(f"Matched {raw} to {index[close[0]]}")
+            key = close[0]
+        resolved.append(index[key])
+    return resolved, unresolved
+
+
+# Adding a player copies their pull cards to the live lists and leaves "-"
+# placeholders behind. The copies name themselves, so they can be sent in the
+# same parallel batch as the renames of their source cards.
+def plan_add(data, names):
+    main_pull = index_cards(getattr(data, "main_pull_cards", []))
+    tier_pull = index_cards(getattr(data, "tier_pull_cards", []))
+    plan = []
+    players = []
+    skipped = []
+    for name in dict.fromkeys(names):
+        if name not in main_pull or name not in tier_pull:
+            skipped.append(name)
+            continue
+        main_card = main_pull[name][0]
+        tier_card = tier_pull[name][0]
+        plan.append(repair_step("POST", "/1/cards",
+                                {"idList": data.main_live_id,
+                                 "idCardSource": main_card["id"],
+                                 "name": name,
+                                 "pos": main_card["pos"]},
+                                f"Add {name} to main live"))
+        plan.append(repair_step("POST", "/1/cards",
+                                {"idList": data.tier_live_id,
+                                 "idCardSource": tier_card["id"],
+                                 "name": name,
+                                 "pos": tier_card["pos"]},
+                                f"Add {name} to tier live"))
+        plan.append(repair_step("PUT", f"/1/cards/{main_card['id']}",
+                                {"name": "-"},
+                                f"Leave main placeholder for {name}"))
+        plan.append(repair_step("PUT", f"/1/cards/{tier_card['id']}",
+                                {"name": "-"},
+                                f"Leave tier placeholder for {name}"))
+        players.extend([name] * 4)
+    return plan, players, skipped
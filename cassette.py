@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+import gzip
+import json
+import threading
+import time
+from collections import deque
+
+
+###############################################################################
+# Trello cassettes
+# Record mode saves every Trello request and response to a gzipped JSON
+# cassette. Replay mode answers requests from the cassette instead of Trello,
+# so a raid session can be rerun offline without API keys. Auth params are
+# never saved.
+class Recorded_Response:
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+        self.content = text.encode()
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class Cassette:
+    def __init__(self, path, mode, latency="0"):
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.interactions = []
+        self.tapes = {}
+        if mode == "replay":
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                self.interactions = json.load(f)
+            for interaction in self.interactions:
+                self.tapes.setdefault(interaction["key"],
+                                      deque()).append(interaction)
+            print(f"Replaying {len(self.interactions)} requests from {path}")
+        elif mode == "record":
+            print(f"Recording requests to {path}")
+
+    @staticmethod
+    def key(trello):
+        params = {name: value for name, value in (trello.params or {}).items()
+                  if name not in ("key", "token")}
+        return json.dumps([trello.method, trello.request,
+                           params, trello.payload],
+                          sort_keys=True, separators=(",", ":"))
+
+    def record(self, trello, resp, elapsed):
+        with self.lock:
+            self.interactions.append({"key": self.key(trello),
+                                      "status": resp.status_code,
+                                      "body": resp.text,
+                                      "elapsed": round(elapsed, 4)})
+
+    # Repeated requests get their recorded responses in order, and the last
+    # one is reused once they run out
+    def play(self, trello):
+        key = self.key(trello)
+        with self.lock:
+            tape = self.tapes.get(key)
+            if not tape:
+                raise KeyError(f"No recorded response for {trello.method} "
+                               f"{trello.request}")
+            interaction = tape.popleft() if len(tape) > 1 else tape[0]
+        if self.latency == "recorded":
+            time.sleep(interaction["elapsed"])
+        elif float(self.latency) > 0:
+            time.sleep(float(self.latency))
+        return Recorded_Response(interaction["status"], interaction["body"])
+
+    def save(self):
+        with self.lock:
+            with gzip.open(self.path, "wt", encoding="utf-8") as f:
+                json.dump(self.interactions, f, separators=(",", ":"))
+        print(f"Saved {len(self.interactions)} requests to {self.path}")
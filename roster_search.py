@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+from board_plan import normalize_name
+
+
+###############################################################################
+# Roster search
+# Built once per board load. Every prefix and trigram of each normalized
+# name maps to a bitset of member positions, and so does each class, so a
+# keystroke costs a few dict lookups and integer ANDs.
+class Roster_Search:
+    def __init__(self, members):
+        self.members = members
+        self.names = [normalize_name(card["name"]) for card in members]
+        self.all = (1 << len(members)) - 1
+        self.prefixes = {}
+        self.trigrams = {}
+        self.classes = {}
+        for i, card in enumerate(members):
+            bit = 1 << i
+            name = self.names[i]
+            for end in range(1, len(name) + 1):
+                prefix = name[:end]
+                self.prefixes[prefix] = self.prefixes.get(prefix, 0) | bit
+            for start in range(len(name) - 2):
+                trigram = name[start:start + 3]
+                self.trigrams[trigram] = self.trigrams.get(trigram, 0) | bit
+            player_class = card["labels"][0]["name"].lower()
+            self.classes[player_class] = (self.classes.get(player_class, 0) |
+                                          bit)
+
+    def matches(self, query):
+        if not query:
+            return self.all
+        bits = self.prefixes.get(query, 0)
+        if len(query) < 3:
+            return bits
+        # Names holding every trigram of the query, checked for a real match
+        contains = self.all & ~bits
+        for start in range(len(query) - 2):
+            contains &= self.trigrams.get(query[start:start + 3], 0)
+        for i in self.positions(contains):
+            if query in self.names[i]:
+                bits |= 1 << i
+        return bits
+
+    @staticmethod
+    def positions(bits):
+        while bits:
+            low = bits & -bits
+            yield low.bit_length() - 1
+            bits ^= low
+
+    def search(self, query, classes):
+        class_bits = 0
+        for player_class in classes:
+            class_bits |= self.classes.get(player_class, 0)
+        bits = self.matches(normalize_name(query)) & class_bits
+        return [self.members[i] for i in self.positions(bits)]
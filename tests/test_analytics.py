@@ -0,0 +1,138 @@
+import csv
+import json
+from datetime import datetime
+
+import pytest
+
+np = pytest.importorskip("numpy")
+import analytics
+
+
+def write_history(path, rows):
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows))
+    return str(path)
+
+
+def write_log(path, lines):
+    path.write_text("".join(f"{stamp},000 - INFO - {message}\n"
+                            for stamp, message in lines))
+    return str(path)
+
+
+def at(day, hour, minute=0):
+    return datetime(2026, 1, day, hour, minute).timestamp()
+
+
+def sk(event, name, when, player_class, position, size=10):
+    return {"time": when, "event": event, "name": name,
+            "player_class": player_class, "position": position, "size": size}
+
+
+# Bob raids three nights and SKs on the first and last, Al raids twice
+RAIDS = [
+    {"time": at(1, 20), "event": "add", "name": "Bob"},
+    {"time": at(1, 20), "event": "add", "name": "Al"},
+    sk("main_sk", "Bob", at(1, 21), "Mage", 1),
+    {"time": at(2, 20), "event": "add", "name": "Bob"},
+    {"time": at(3, 20), "event": "add", "name": "Bob"},
+    {"time": at(3, 20), "event": "add", "name": "Al"},
+    sk("main_sk", "Bob", at(3, 21), "Mage", 4),
+    sk("main_sk", "Al", at(3, 21, 30), "Rogue", 3),
+    sk("tier_sk", "Al", at(3, 22), "Rogue", 2, size=5),
+]
+
+
+def test_player_stats():
+    history = analytics.History(RAIDS)
+    assert history.names == ["Al", "Bob"]
+    assert history.classes == ["Mage", "Rogue"]
+    assert history.attendance().tolist() == [2, 3]
+    assert history.sk_counts("main_sk").tolist() == [1, 2]
+    assert history.sk_counts("tier_sk").tolist() == [1, 0]
+    waits = history.waits("main_sk")
+    assert np.isnan(waits[0])
+    assert waits[1] == pytest.approx(2.0)
+    assert history.positions("main_sk").tolist() == [3.0, 2.5]
+    assert history.class_positions("main_sk").tolist() == [2.5, 3.0]
+
+
+def test_drift_counts_raids_attended_between_sks():
+    drift = analytics.History(RAIDS).drift("main_sk")
+    assert np.isnan(drift[0])
+    # Bob climbed from the bottom to 4th of 10 over two raids: 6/9 / 2
+    assert drift[1] == pytest.approx(1 / 3)
+
+
+def test_event_log_undo_drops_latest_sk(tmp_path):
+    log_fn = write_log(tmp_path / "events.log", [
+        ("2026-01-01 20:00:00", "Created: pull/live"),
+        ("2026-01-01 20:00:00", "Added: Bob"),
+        ("2026-01-01 21:00:00", "Main SK: Bob"),
+        ("2026-01-01 21:05:00", "Tier SK: Bob"),
+        ("2026-01-01 21:10:00", "Main SK: Bob"),
+        ("2026-01-01 21:11:00", "SK undone: Bob"),
+        ("2026-01-01 23:00:00", "Merged: pull/live"),
+    ])
+    rows = analytics.read_event_log(log_fn)
+    assert [row["event"] for row in rows] == [
+        "add", "main_sk", "tier_sk", "main_sk", "undo", "merge"]
+    assert rows[1]["time"] == at(1, 21)
+    assert rows[-1]["name"] is None
+    kept = analytics.apply_undos(rows)
+    assert [(row["event"], row["time"]) for row in kept] == [
+        ("add", at(1, 20)), ("main_sk", at(1, 21)),
+        ("tier_sk", at(1, 21, 5)), ("merge", at(1, 23))]
+
+
+def test_export_csv_writes_one_header(tmp_path):
+    path = tmp_path / "stats.csv"
+    histories = [analytics.History([], "Empty"),
+                 analytics.History(RAIDS, "A")]
+    assert analytics.export_csv(histories, str(path)) == 2
+    with open(path, newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0][:5] == ["team", "name", "class", "raids", "main_sks"]
+    assert [row[:5] for row in rows[1:]] == [["A", "Al", "Rogue", "2", "1"],
+                                             ["A", "Bob", "Mage", "3", "2"]]
+    assert rows[2][rows[0].index("main_drift")] == "0.333"
+    assert rows[1][rows[0].index("main_wait_days")] == "-"
+
+
+def test_teams_are_kept_apart(tmp_path):
+    day = 86400
+    history_fn = write_history(tmp_path / "history.jsonl", [
+        {"time": 0, "event": "add", "team": "A", "name": "Bob"},
+        {"time": 60, "event": "main_sk", "team": "A", "name": "Bob",
+         "player_class": "Mage", "position": 1, "size": 10},
+        {"time": 7 * day, "event": "add", "team": "B", "name": "Bob"},
+        {"time": 7 * day + 60, "event": "main_sk", "team": "B",
+         "name": "Bob", "player_class": "Rogue", "position": 5, "size": 20},
+        {"time": 7 * day + 120, "event": "undo", "team": "B", "name": "Bob"},
+    ])
+    teams = analytics.load_teams(history_fn, str(tmp_path / "none.log"))
+    assert sorted(teams) == ["A", "B"]
+    assert teams["A"].sk_counts("main_sk").tolist() == [1]
+    # The undo on team B must not remove team A's SK
+    assert teams["B"].sk_counts("main_sk").tolist() == [0]
+    assert teams["A"].attendance().tolist() == [1]
+    only_b = analytics.load(history_fn, "none.log", team="B")
+    assert only_b.team == "B"
+    assert len(only_b.time) == 1
+    assert "Team: A" in analytics.report(teams["A"])
+
+
+def test_event_log_fills_in_raids_before_history(tmp_path):
+    log_fn = write_log(tmp_path / "events.log", [
+        ("2026-01-01 20:00:00", "Added: Bob"),
+        ("2026-01-01 21:00:00", "Main SK: Bob"),
+        ("2026-01-08 20:00:00", "Added: Bob"),
+    ])
+    start = datetime(2026, 1, 8, 20).timestamp()
+    history_fn = write_history(tmp_path / "history.jsonl", [
+        {"time": start, "event": "add", "team": "A", "name": "Bob"},
+    ])
+    rows = analytics.read_rows(history_fn, log_fn)
+    # The last log line repeats the first history row
+    assert [(row["event"], row.get("team")) for row in rows] == [
+        ("add", None), ("main_sk", None), ("add", "A")]
+    assert set(analytics.load_teams(history_fn, log_fn)) == {None, "A"}
@@ -0,0 +1,191 @@
+from types import SimpleNamespace
+
+from board_plan import (normalize_name, parse_roster, plan_add, resolve_roster,
+                        verify_board)
+
+BOARD = {"main_pull": "Main Pull List", "tier_pull": "Tier Pull List",
+         "main_live": "Main Live List", "tier_live": "Tier Live List"}
+LIST_IDS = {"main_master": "MM", "tier_master": "TM",
+            "main_pull": "MP", "tier_pull": "TP",
+            "main_live": "ML", "tier_live": "TL"}
+
+
+def card(list_name, name, pos, card_id=None):
+    return {"id": card_id or f"{LIST_IDS[list_name]}-{name}-{pos}",
+            "name": name,
+            "idList": LIST_IDS[list_name],
+            "pos": pos}
+
+
+# Builds a board from {list name: [card names]}, master lists default to the
+# full roster in order
+def board(roster, **lists):
+    data = SimpleNamespace(board=BOARD)
+    for list_name, list_id in LIST_IDS.items():
+        setattr(data, f"{list_name}_id", list_id)
+        names = lists.get(list_name, roster if "master" in list_name else [])
+        setattr(data, f"{list_name}_cards",
+                [card(list_name, name, pos) for pos, name in enumerate(names)])
+    return data
+
+
+def steps(plan):
+    return [(step["method"], step["request"], step["params"])
+            for step in plan]
+
+
+def test_consistent_board_has_no_problems():
+    data = board("ABC",
+                 main_pull=["-", "-", "C"], tier_pull=["-", "-", "C"],
+                 main_live=["A", "B"], tier_live=["B", "A"])
+    assert verify_board(data) == ([], [])
+
+
+def test_orphan_placeholder_is_deleted():
+    data = board("ABC",
+                 main_pull=["-", "B", "C", "-"], tier_pull=["-", "B", "C"],
+                 main_live=["A"], tier_live=["A"])
+    problems, plan = verify_board(data)
+    assert problems == ["Main Pull List has 2 placeholders for 1 live players"]
+    assert steps(plan) == [("DELETE", "/1/cards/MP---3", {})]
+
+
+def test_missing_from_tier_live_copies_with_name_then_renames():
+    data = board("ABC",
+                 main_pull=["-", "-", "C"], tier_pull=["-", "B", "C"],
+                 main_live=["A", "B"], tier_live=["A"])
+    problems, plan = verify_board(data)
+    assert problems == ["Missing from Tier Live List: B"]
+    # The copy names itself, so it cannot pick up the "-" rename of its source
+    assert steps(plan) == [("POST", "/1/cards", {"idList": "TL",
+                                                 "idCardSource": "TP-B-1",
+                                                 "name": "B",
+                                                 "pos": 1}),
+                           ("PUT", "/1/cards/TP-B-1", {"name": "-"})]
+
+
+def test_half_finished_add_gets_its_placeholder():
+    data = board("AB",
+                 main_pull=["A", "B"], tier_pull=["-", "B"],
+                 main_live=["A"], tier_live=["A"])
+    problems, plan = verify_board(data)
+    assert "On both Main Pull List and Main Live List: A" in problems
+    assert steps(plan) == [("PUT", "/1/cards/MP-A-0", {"name": "-"})]
+
+
+def test_duplicate_live_card_is_deleted():
+    data = board("AB",
+                 main_pull=["-", "B"], tier_pull=["-", "B"],
+                 main_live=["A", "A"], tier_live=["A"])
+    problems, plan = verify_board(data)
+    assert "Duplicate on Main Live List: A" in problems
+    assert steps(plan) == [("DELETE", "/1/cards/ML-A-1", {})]
+
+
+def test_player_missing_everywhere_is_restored_from_master():
+    data = board("AB", main_pull=["A"], tier_pull=["A", "B"])
+    problems, plan = verify_board(data)
+    assert problems == ["Missing from Main Pull List and Main Live List: B"]
+    assert steps(plan) == [("POST", "/1/cards", {"idList": "MP",
+                                                 "idCardSource": "MM-B-1",
+                                                 "pos": 1})]
+
+
+def test_missing_placeholder_is_added_at_bottom():
+    data = board("AB",
+                 main_pull=["B"], tier_pull=["-", "B"],
+                 main_live=["A"], tier_live=["A"])
+    problems, plan = verify_board(data)
+    assert problems == ["Main Pull List has 0 placeholders for 1 live players"]
+    assert steps(plan) == [("POST", "/1/cards", {"idList": "MP",
+                                                 "name": "-",
+                                                 "pos": "bottom"})]
+
+
+def test_placeholder_on_live_list_is_deleted_and_player_restored():
+    # B's live copy picked up the rename of its source card
+    data = board("AB",
+                 main_pull=["-", "-"], tier_pull=["-", "B"],
+                 main_live=["A", "-"], tier_live=["A"])
+    problems, plan = verify_board(data)
+    assert problems == ["Placeholder on Main Live List",
+                        "Missing from Main Pull List and Main Live List: B",
+                        "Main Pull List has 2 placeholders for 1 live players"]
+    assert steps(plan) == [("DELETE", "/1/cards/ML---1", {}),
+                           ("POST", "/1/cards", {"idList": "MP",
+                                                 "idCardSource": "MM-B-1",
+                                                 "pos": 1}),
+                           ("DELETE", "/1/cards/MP---1", {})]
+
+
+def test_duplicate_pull_card_of_copied_player_is_deleted():
+    data = board("AB",
+                 main_pull=["A", "-"], tier_pull=["A", "B", "B"],
+                 main_live=["B"])
+    problems, plan = verify_board(data)
+    assert problems == ["Missing from Tier Live List: B",
+                        "Duplicate on Tier Pull List: B"]
+    assert steps(plan) == [("POST", "/1/cards", {"idList": "TL",
+                                                 "idCardSource": "TP-B-1",
+                                                 "name": "B",
+                                                 "pos": 1}),
+                           ("PUT", "/1/cards/TP-B-1", {"name": "-"}),
+                           ("DELETE", "/1/cards/TP-B-2", {})]
+
+
+def test_plan_add_copies_with_names_and_leaves_placeholders():
+    data = board("ABC", main_pull=["A", "B", "C"], tier_pull=["C", "B", "A"])
+    plan, players, skipped = plan_add(data, ["B", "B"])
+    assert skipped == []
+    assert players == ["B"] * 4
+    assert steps(plan) == [("POST", "/1/cards", {"idList": "ML",
+                                                 "idCardSource": "MP-B-1",
+                                                 "name": "B",
+                                                 "pos": 1}),
+                           ("POST", "/1/cards", {"idList": "TL",
+                                                 "idCardSource": "TP-B-1",
+                                                 "name": "B",
+                                                 "pos": 1}),
+                           ("PUT", "/1/cards/MP-B-1", {"name": "-"}),
+                           ("PUT", "/1/cards/TP-B-1", {"name": "-"})]
+
+
+def test_plan_add_skips_players_already_in_raid():
+    data = board("AB",
+                 main_pull=["-", "B"], tier_pull=["-", "B"],
+                 main_live=["A"], tier_live=["A"])
+    plan, players, skipped = plan_add(data, ["A", "B", "Nobody"])
+    assert skipped == ["A", "Nobody"]
+    assert players == ["B"] * 4
+
+
+def members(*names):
+    return [{"id": f"M{i}", "name": name} for i, name in enumerate(names)]
+
+
+def test_normalize_name_strips_realm_accents_and_case():
+    assert normalize_name("  Zúl-Stalagg ") == "zul"
+    assert normalize_name("Ëlvëra") == "elvera"
+    assert normalize_name("Bob") == "bob"
+
+
+def test_parse_roster_skips_headers_and_blank_rows():
+    text = "Name,Class\nBob,Mage\n\n ,Rogue\nPlayer\n\"Al, Jr\",Warrior\nZed"
+    assert parse_roster(text) == ["Bob", "Al, Jr", "Zed"]
+
+
+def test_resolve_roster_matches_exact_and_normalized_names():
+    cards = members("Zul", "Bob")
+    assert resolve_roster("bob\nZúl-Stalagg\n", cards) == (["Bob", "Zul"], [])
+
+
+def test_resolve_roster_falls_back_to_close_matches(capsys):
+    cards = members("Thunderfist", "Bob")
+    assert resolve_roster("Thunderfst", cards) == (["Thunderfist"], [])
+    assert "Matched Thunderfst to Thunderfist" in capsys.readouterr().out
+
+
+def test_resolve_roster_reports_unresolved_names():
+    cards = members("Thunderfist", "Bob")
+    assert resolve_roster("Bobby\nNobody\nBob", cards) == (["Bob"],
+                                                          ["Bobby", "Nobody"])
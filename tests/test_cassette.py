@@ -0,0 +1,58 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from cassette import Cassette, Recorded_Response
+
+
+def trello(request, params=None, method="GET", payload=None):
+    return SimpleNamespace(method=method, request=request,
+                           params=params, payload=payload)
+
+
+def test_round_trip_replays_recorded_responses(tmp_path):
+    path = str(tmp_path / "raid.json.gz")
+    recorder = Cassette(path, "record")
+    recorder.record(trello("/1/boards/b/lists"),
+                    Recorded_Response(200, '[{"id": "L1"}]'), 0.25)
+    recorder.record(trello("/1/cards", {"name": "Bob"}, "POST"),
+                    Recorded_Response(401, "invalid token"), 0.1)
+    recorder.save()
+
+    player = Cassette(path, "replay")
+    resp = player.play(trello("/1/boards/b/lists"))
+    assert resp.status_code == 200
+    assert resp.json() == [{"id": "L1"}]
+    resp = player.play(trello("/1/cards", {"name": "Bob"}, "POST"))
+    assert (resp.status_code, resp.content) == (401, b"invalid token")
+
+
+def test_key_and_token_are_not_part_of_the_key():
+    with_auth = trello("/1/cards", {"key": "k", "token": "t", "pos": "top"})
+    without_auth = trello("/1/cards", {"pos": "top"})
+    key = Cassette.key(with_auth)
+    assert key == Cassette.key(without_auth)
+    assert json.loads(key)[2] == {"pos": "top"}
+
+
+def test_repeated_requests_replay_in_order_then_reuse_last(tmp_path):
+    path = str(tmp_path / "raid.json.gz")
+    recorder = Cassette(path, "record")
+    for body in ("1", "2"):
+        recorder.record(trello("/1/lists/l/cards"),
+                        Recorded_Response(200, body), 0)
+    recorder.save()
+
+    player = Cassette(path, "replay")
+    bodies = [player.play(trello("/1/lists/l/cards")).json()
+              for i in range(3)]
+    assert bodies == [1, 2, 2]
+
+
+def test_unrecorded_request_raises_key_error(tmp_path):
+    path = str(tmp_path / "raid.json.gz")
+    Cassette(path, "record").save()
+    player = Cassette(path, "replay")
+    with pytest.raises(KeyError):
+        player.play(trello("/1/cards/c", method="DELETE"))
@@ -0,0 +1,58 @@
+from roster_search import Roster_Search
+
+CLASSES = ["mage", "rogue", "warrior"]
+
+
+def members(*players):
+    return [{"id": f"M{i}", "name": name, "labels": [{"name": player_class}]}
+            for i, (name, player_class) in enumerate(players)]
+
+
+ROSTER = members(("Abaxbab", "Warrior"),
+                 ("Abob", "Mage"),
+                 ("Aldric", "Rogue"),
+                 ("Bob", "Rogue"),
+                 ("Malbob", "Mage"),
+                 ("Zúl-Stalagg", "Mage"))
+
+
+def names(cards):
+    return [card["name"] for card in cards]
+
+
+def test_short_queries_only_match_prefixes():
+    search = Roster_Search(ROSTER)
+    assert names(search.search("al", CLASSES)) == ["Aldric"]
+    assert names(search.search("B", CLASSES)) == ["Bob"]
+
+
+def test_empty_query_matches_everyone():
+    search = Roster_Search(ROSTER)
+    assert names(search.search("", CLASSES)) == names(ROSTER)
+
+
+def test_longer_queries_match_substrings_in_roster_order():
+    search = Roster_Search(ROSTER)
+    # Abob and Malbob match inside the name, Bob by prefix
+    assert names(search.search("bob", CLASSES)) == ["Abob", "Bob", "Malbob"]
+    assert names(search.search("alb", CLASSES)) == ["Malbob"]
+
+
+def test_trigrams_alone_are_not_a_match():
+    # Abaxbab has both trigrams of "abab" but not the substring
+    search = Roster_Search(ROSTER)
+    assert names(search.search("abab", CLASSES)) == []
+
+
+def test_query_is_normalized():
+    search = Roster_Search(ROSTER)
+    assert names(search.search("ZUL-Other", CLASSES)) == ["Zúl-Stalagg"]
+
+
+def test_classes_narrow_the_matches():
+    search = Roster_Search(ROSTER)
+    assert names(search.search("bob", ["mage"])) == ["Abob", "Malbob"]
+    assert names(search.search("", ["rogue", "warrior"])) == ["Abaxbab",
+                                                              "Aldric",
+                                                              "Bob"]
+    assert search.search("bob", ["priest"]) == []